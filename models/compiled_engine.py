@@ -0,0 +1,215 @@
+"""
+Compiled torch inference engine for Florence-2 with a static KV cache.
+"""
+
+import time
+import logging
+from typing import Optional, Dict, Any, Tuple
+
+import torch
+import torch.nn.functional as F
+
+from .decoding import DecodeTimer, generation_settings, select_next_token
+
+logger = logging.getLogger(__name__)
+
+# Prompt token lengths that encoder inputs are padded up to
+DEFAULT_PROMPT_BUCKETS = (16, 32, 64)
+
+
+class StaticCacheDecoderStep(torch.nn.Module):
+    """Single-token Florence-2 decoder step over preallocated KV buffers.
+
+    Every tensor has a fixed shape for a given encoder bucket, so the step
+    compiles to one graph per bucket and never reallocates its cache.
+    """
+
+    def __init__(self, language_model, max_cache_length: int, dtype: torch.dtype, device: str):
+        super().__init__()
+        self.decoder = language_model.get_decoder()
+        self.lm_head = language_model.lm_head
+        self.final_logits_bias = getattr(language_model, "final_logits_bias", None)
+        self.embed_scale = getattr(self.decoder, "embed_scale", 1.0)
+        self.position_offset = getattr(self.decoder.embed_positions, "offset", 0)
+        self.max_cache_length = max_cache_length
+
+        attention = self.decoder.layers[0].self_attn
+        self.num_heads = attention.num_heads
+        self.head_dim = attention.head_dim
+        cache_shape = (len(self.decoder.layers), 1, self.num_heads, max_cache_length, self.head_dim)
+        self.register_buffer("self_key", torch.zeros(cache_shape, dtype=dtype, device=device), persistent=False)
+        self.register_buffer("self_value", torch.zeros(cache_shape, dtype=dtype, device=device), persistent=False)
+        self.register_buffer("cache_positions", torch.arange(max_cache_length, device=device), persistent=False)
+
+    def _split_heads(self, states: torch.Tensor) -> torch.Tensor:
+        """Reshape (batch, length, dim) projections to (batch, heads, length, head_dim)."""
+        batch, length, _ = states.shape
+        return states.view(batch, length, self.num_heads, self.head_dim).transpose(1, 2)
+
+    def _attend(self, query, key, value, mask, out_proj) -> torch.Tensor:
+        """Masked attention followed by the output projection."""
+        attended = F.scaled_dot_product_attention(query, key, value, attn_mask=mask)
+        batch, _, length, _ = attended.shape
+        return out_proj(attended.transpose(1, 2).reshape(batch, length, self.num_heads * self.head_dim))
+
+    def cross_attention_cache(self, encoder_hidden_states: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Project encoder states to per-layer cross-attention keys and values."""
+        keys = [self._split_heads(layer.encoder_attn.k_proj(encoder_hidden_states)) for layer in self.decoder.layers]
+        values = [self._split_heads(layer.encoder_attn.v_proj(encoder_hidden_states)) for layer in self.decoder.layers]
+        return torch.stack(keys), torch.stack(values)
+
+    def forward(self, input_ids, position, cross_key, cross_value, cross_mask):
+        hidden = self.decoder.embed_tokens(input_ids) * self.embed_scale
+        hidden = hidden + self.decoder.embed_positions.weight[position + self.position_offset].unsqueeze(0)
+        if getattr(self.decoder, "layernorm_embedding", None) is not None:
+            hidden = self.decoder.layernorm_embedding(hidden)
+
+        self_mask = torch.zeros(self.max_cache_length, dtype=hidden.dtype, device=hidden.device)
+        self_mask = self_mask.masked_fill(self.cache_positions > position, float("-inf")).view(1, 1, 1, -1)
+
+        for i, layer in enumerate(self.decoder.layers):
+            attention = layer.self_attn
+            residual = hidden
+            query = self._split_heads(attention.q_proj(hidden))
+            self.self_key[i].index_copy_(2, position, self._split_heads(attention.k_proj(hidden)))
+            self.self_value[i].index_copy_(2, position, self._split_heads(attention.v_proj(hidden)))
+            hidden = self._attend(query, self.self_key[i], self.self_value[i], self_mask, attention.out_proj)
+            hidden = layer.self_attn_layer_norm(residual + hidden)
+
+            attention = layer.encoder_attn
+            residual = hidden
+            query = self._split_heads(attention.q_proj(hidden))
+            hidden = self._attend(query, cross_key[i], cross_value[i], cross_mask, attention.out_proj)
+            hidden = layer.encoder_attn_layer_norm(residual + hidden)
+
+            residual = hidden
+            hidden = layer.fc2(layer.activation_fn(layer.fc1(hidden)))
+            hidden = layer.final_layer_norm(residual + hidden)
+
+        if getattr(self.decoder, "layer_norm", None) is not None:
+            hidden = self.decoder.layer_norm(hidden)
+
+        logits = self.lm_head(hidden[:, -1])
+        if self.final_logits_bias is not None:
+            logits = logits + self.final_logits_bias
+        return logits
+
+
+class CompiledTorchEngine:
+    """Greedy Florence-2 generation with a static KV cache and a compiled decoder step."""
+
+    def __init__(
+        self,
+        model,
+        max_new_tokens: int = 1024,
+        prompt_buckets: Tuple[int, ...] = DEFAULT_PROMPT_BUCKETS
+    ):
+        self.model = model
+        self.max_new_tokens = max_new_tokens
+        self.prompt_buckets = tuple(sorted(prompt_buckets))
+        self.settings = generation_settings(model)
+        self.device = next(model.parameters()).device
+        self.dtype = next(model.parameters()).dtype
+        self.decoder_step = StaticCacheDecoderStep(
+            model.language_model, max_new_tokens + 1, self.dtype, self.device
+        )
+        self.compiled_step = None
+        self.image_tokens = None
+        self.stats: Dict[str, Any] = {"warmup_seconds": 0.0}
+
+    def _encode(self, input_ids: torch.Tensor, pixel_values: torch.Tensor) -> torch.Tensor:
+        """Run the vision tower and text encoder eagerly."""
+        image_features = self.model._encode_image(pixel_values)
+        inputs_embeds = self.model.get_input_embeddings()(input_ids)
+        inputs_embeds, attention_mask = self.model._merge_input_ids_with_image_features(image_features, inputs_embeds)
+        encoder = self.model.language_model.get_encoder()
+        return encoder(inputs_embeds=inputs_embeds, attention_mask=attention_mask, return_dict=True).last_hidden_state
+
+    def _bucket_length(self, prompt_length: int) -> Optional[int]:
+        """Return the padded encoder length for a prompt, or None if it exceeds every bucket."""
+        for bucket in self.prompt_buckets:
+            if prompt_length <= bucket:
+                return self.image_tokens + bucket
+        return None
+
+    def _pad_to_bucket(self, encoder_hidden_states: torch.Tensor, bucket_length: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Zero-pad encoder states to the bucket length and build the matching cross-attention mask."""
+        length = encoder_hidden_states.shape[1]
+        padded = F.pad(encoder_hidden_states, (0, 0, 0, bucket_length - length))
+        mask = torch.zeros(1, 1, 1, bucket_length, dtype=self.dtype, device=self.device)
+        mask[..., length:] = float("-inf")
+        return padded, mask
+
+    def load(self, image_size: Tuple[int, int]) -> bool:
+        """Compile the decoder step and warm up every encoder bucket."""
+        try:
+            hidden_size = self.model.language_model.config.d_model
+            with torch.no_grad():
+                pixel_values = torch.zeros(1, 3, image_size[1], image_size[0], dtype=self.dtype, device=self.device)
+                self.image_tokens = self.model._encode_image(pixel_values).shape[1]
+
+            self.compiled_step = torch.compile(self.decoder_step, dynamic=False, fullgraph=True)
+
+            start = time.perf_counter()
+            with torch.no_grad():
+                for bucket in self.prompt_buckets:
+                    bucket_start = time.perf_counter()
+                    encoder_hidden_states = torch.zeros(
+                        1, self.image_tokens + bucket, hidden_size, dtype=self.dtype, device=self.device
+                    )
+                    cross_key, cross_value = self.decoder_step.cross_attention_cache(encoder_hidden_states)
+                    cross_mask = torch.zeros(1, 1, 1, encoder_hidden_states.shape[1], dtype=self.dtype, device=self.device)
+                    input_ids = torch.tensor([[self.settings["decoder_start_token_id"]]], device=self.device)
+                    for step in range(2):
+                        position = torch.tensor([step], device=self.device)
+                        self.compiled_step(input_ids, position, cross_key, cross_value, cross_mask)
+                    logger.info(f"Warmed up bucket {bucket} in {time.perf_counter() - bucket_start:.2f}s")
+            self.stats["warmup_seconds"] = time.perf_counter() - start
+
+            logger.info(f"✅ Compiled decoder ready, warm-up took {self.stats['warmup_seconds']:.2f}s")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to compile decoder step: {str(e)}")
+            self.compiled_step = None
+            return False
+
+    def supports(self, input_ids: torch.Tensor) -> bool:
+        """Check whether a prompt fits one of the compiled buckets."""
+        return self.compiled_step is not None and self._bucket_length(input_ids.shape[1]) is not None
+
+    def generate(
+        self,
+        input_ids: torch.Tensor,
+        pixel_values: torch.Tensor,
+        timer: Optional[DecodeTimer] = None
+    ) -> torch.Tensor:
+        """Generate token ids for a single image and prompt."""
+        with torch.no_grad():
+            encoder_hidden_states = self._encode(input_ids, pixel_values.to(self.dtype))
+            bucket_length = self._bucket_length(input_ids.shape[1])
+            encoder_hidden_states, cross_mask = self._pad_to_bucket(encoder_hidden_states, bucket_length)
+            cross_key, cross_value = self.decoder_step.cross_attention_cache(encoder_hidden_states)
+
+            eos_token_id = self.settings["eos_token_id"]
+            max_length = self.max_new_tokens + 1
+            tokens = [self.settings["decoder_start_token_id"]]
+
+            while len(tokens) < max_length:
+                step_ids = torch.tensor([[tokens[-1]]], device=self.device)
+                position = torch.tensor([len(tokens) - 1], device=self.device)
+                logits = self.compiled_step(step_ids, position, cross_key, cross_value, cross_mask)
+                next_token = select_next_token(logits[0].float().cpu().numpy(), tokens, max_length, self.settings)
+                tokens.append(next_token)
+                if timer is not None:
+                    timer.step()
+                if next_token == eos_token_id:
+                    break
+
+        return torch.tensor([tokens], device=self.device)
+
+    def cleanup(self):
+        """Release the compiled graph and static cache."""
+        self.compiled_step = None
+        self.decoder_step = None
+        self.model = None
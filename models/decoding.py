@@ -0,0 +1,80 @@
+"""
+Greedy decoding helpers shared by the custom Florence-2 inference engines.
+"""
+
+import time
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+
+def generation_settings(model) -> Dict[str, Any]:
+    """Collect the token rules `generate` applies for a Florence-2 model."""
+    language_config = model.language_model.config
+    generation_config = model.language_model.generation_config
+
+    decoder_start_token_id = generation_config.decoder_start_token_id
+    if decoder_start_token_id is None:
+        decoder_start_token_id = language_config.decoder_start_token_id
+
+    return {
+        "num_layers": language_config.decoder_layers,
+        "decoder_start_token_id": decoder_start_token_id,
+        "eos_token_id": generation_config.eos_token_id,
+        "forced_bos_token_id": generation_config.forced_bos_token_id,
+        "forced_eos_token_id": generation_config.forced_eos_token_id,
+        "no_repeat_ngram_size": generation_config.no_repeat_ngram_size or 0
+    }
+
+
+class DecodeTimer:
+    """Time decoder steps after the first one, excluding encoder and prefill cost."""
+
+    def __init__(self):
+        self.first_step: Optional[float] = None
+        self.last_step: Optional[float] = None
+        self.steps = 0
+
+    def step(self):
+        """Record that a token has just been generated."""
+        now = time.perf_counter()
+        if self.first_step is None:
+            self.first_step = now
+        self.last_step = now
+        self.steps += 1
+
+    @property
+    def decode_seconds(self) -> float:
+        return 0.0 if self.first_step is None else self.last_step - self.first_step
+
+    @property
+    def decode_tokens(self) -> int:
+        return max(self.steps - 1, 0)
+
+
+def banned_ngram_tokens(tokens: List[int], ngram_size: int) -> List[int]:
+    """Return tokens that would repeat an already generated n-gram."""
+    if ngram_size <= 0 or len(tokens) + 1 < ngram_size:
+        return []
+    prefix = tuple(tokens[len(tokens) - ngram_size + 1:])
+    return [
+        tokens[i + ngram_size - 1]
+        for i in range(len(tokens) - ngram_size + 1)
+        if tuple(tokens[i:i + ngram_size - 1]) == prefix
+    ]
+
+
+def select_next_token(logits: np.ndarray, tokens: List[int], max_length: int, settings: Dict[str, Any]) -> int:
+    """Pick the next token, mirroring the forced-token and n-gram rules of `generate`."""
+    forced_bos = settings.get("forced_bos_token_id")
+    forced_eos = settings.get("forced_eos_token_id")
+    if len(tokens) == 1 and forced_bos is not None:
+        return forced_bos
+    if len(tokens) == max_length - 1 and forced_eos is not None:
+        return forced_eos
+
+    banned = banned_ngram_tokens(tokens, settings.get("no_repeat_ngram_size", 0))
+    if banned:
+        logits = logits.copy()
+        logits[banned] = -np.inf
+    return int(np.argmax(logits))
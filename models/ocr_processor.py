@@ -6,17 +6,75 @@ import torch
 from typing import Optional, Union, Dict, Any
 from PIL import Image
 import logging
-from transformers import AutoProcessor, AutoModelForCausalLM
+from transformers import AutoProcessor, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList
 import gc
+import time
+import importlib.util
 import numpy as np
+from utils.image_utils import is_likely_blank, DEFAULT_MIN_CONTRAST, DEFAULT_MIN_EDGE_DENSITY
+from .compiled_engine import CompiledTorchEngine
+from .decoding import DecodeTimer
+from .onnx_engine import ONNXInferenceEngine, export_florence_to_onnx, default_export_dir
 
 logger = logging.getLogger(__name__)
 
+SUPPORTED_ENGINES = {"torch", "onnx"}
+SUPPORTED_PREFILTER_MODES = {"off", "on", "audit"}
+NO_TEXT_MESSAGE = "No text detected in the image"
+
+class _DecodeTimerCriteria(StoppingCriteria):
+    """Stopping criteria that never stops, used to time eager `generate` steps."""
+    
+    def __init__(self, timer: DecodeTimer):
+        self.timer = timer
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        self.timer.step()
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
 class OCRProcessor:
     """Vision-Language Model based OCR processor using Florence-2."""
     
-    def __init__(self, model_name: str = "microsoft/Florence-2-large"):
+    def __init__(
+        self,
+        model_name: str = "microsoft/Florence-2-large",
+        engine: str = "torch",
+        num_beams: int = 3,
+        compile_decoder: bool = False,
+        onnx_export_dir: Optional[str] = None,
+        onnx_num_threads: Optional[int] = None,
+        prefilter: str = "off",
+        prefilter_min_contrast: float = DEFAULT_MIN_CONTRAST,
+        prefilter_min_edge_density: float = DEFAULT_MIN_EDGE_DENSITY
+    ):
+        if engine not in SUPPORTED_ENGINES:
+            raise ValueError(f"Unsupported engine '{engine}', expected one of {sorted(SUPPORTED_ENGINES)}")
+        if prefilter not in SUPPORTED_PREFILTER_MODES:
+            raise ValueError(f"Unsupported prefilter mode '{prefilter}', expected one of {sorted(SUPPORTED_PREFILTER_MODES)}")
+        if engine == "onnx" and num_beams != 1:
+            logger.warning(
+                f"ONNX engine decodes greedily and ignores num_beams={num_beams}; "
+                "output may differ from the torch engine's beam search"
+            )
+        if compile_decoder and num_beams != 1:
+            logger.warning(
+                f"Compiled decoder only supports greedy decoding; it is disabled for num_beams={num_beams}"
+            )
+        
         self.model_name = model_name
+        self.engine = engine
+        self.num_beams = num_beams
+        self.compile_decoder = compile_decoder and num_beams == 1
+        self.compiled_engine = None
+        self.onnx_export_dir = onnx_export_dir or default_export_dir(model_name)
+        self.onnx_num_threads = onnx_num_threads
+        self.onnx_engine = None
+        self.prefilter = prefilter
+        self.prefilter_min_contrast = prefilter_min_contrast
+        self.prefilter_min_edge_density = prefilter_min_edge_density
+        self.prefilter_stats = {"checked": 0, "rejected": 0, "would_reject": 0}
+        self.load_seconds = None
+        self.decode_stats = {"decode_seconds": 0.0, "generated_tokens": 0}
         self.model = None
         self.processor = None
         self.device = self._get_device()
@@ -24,12 +82,14 @@ class OCRProcessor:
         self.fallback_mode = False
         self.fallback_ocr = None
         
-        logger.info(f"OCR Processor initialized with device: {self.device}, dtype: {self.torch_dtype}")
+        logger.info(f"OCR Processor initialized with device: {self.device}, dtype: {self.torch_dtype}, engine: {self.engine}")
         logger.info(f"Model: {self.model_name}")
     
     def _get_device(self) -> str:
         """Determine the best available device for inference."""
-        if torch.cuda.is_available():
+        if self.engine == "onnx":
+            return "cpu"
+        elif torch.cuda.is_available():
             return "cuda"
         elif torch.backends.mps.is_available():
             return "mps"
@@ -81,8 +141,55 @@ class OCRProcessor:
         logger.info("✅ Test mode fallback initialized!")
         return True
     
+    def _load_onnx_engine(self) -> bool:
+        """Export Florence-2 to ONNX once and load it with ONNX Runtime."""
+        if importlib.util.find_spec("onnxruntime") is None:
+            logger.warning("ONNX Runtime not available. Install with: pip install onnx onnxruntime")
+            return False
+        
+        onnx_engine = ONNXInferenceEngine(self.onnx_export_dir, num_threads=self.onnx_num_threads)
+        
+        if not onnx_engine.is_exported():
+            if importlib.util.find_spec("onnx") is None:
+                logger.warning("ONNX is required to export the model. Install with: pip install onnx")
+                return False
+            logger.info("No ONNX export found, exporting Florence-2 (one-time step)...")
+            model = AutoModelForCausalLM.from_pretrained(
+                self.model_name,
+                torch_dtype=torch.float32,
+                trust_remote_code=True
+            )
+            exported = export_florence_to_onnx(model, self.processor, self.onnx_export_dir)
+            del model
+            gc.collect()
+            if not exported:
+                return False
+        
+        if not onnx_engine.load():
+            return False
+        
+        self.onnx_engine = onnx_engine
+        logger.info("✅ Florence-2 ONNX engine loaded successfully!")
+        return True
+    
+    def _load_compiled_engine(self) -> bool:
+        """Compile the decoder step over a static KV cache and warm up all buckets."""
+        try:
+            size = self.processor.image_processor.size
+            compiled_engine = CompiledTorchEngine(self.model, max_new_tokens=1024)
+        except Exception as e:
+            logger.error(f"Failed to build compiled decoder: {str(e)}")
+            return False
+        
+        if not compiled_engine.load(image_size=(size["width"], size["height"])):
+            return False
+        
+        self.compiled_engine = compiled_engine
+        return True
+    
     def load_model(self) -> bool:
         """Load the Florence-2 model and processor."""
+        start = time.perf_counter()
         try:
             logger.info(f"Loading Florence-2 model: {self.model_name}")
             logger.info("This may take a few minutes on first run...")
@@ -92,6 +199,15 @@ class OCRProcessor:
                 trust_remote_code=True
             )
             
+            if self.engine == "onnx":
+                if self._load_onnx_engine():
+                    self.load_seconds = time.perf_counter() - start
+                    return True
+                logger.info("💡 ONNX engine unavailable, falling back to the torch engine...")
+                self.engine = "torch"
+                self.device = self._get_device()
+                self.torch_dtype = self._get_torch_dtype()
+            
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.model_name,
                 torch_dtype=self.torch_dtype,
@@ -100,6 +216,10 @@ class OCRProcessor:
             
             self.model.eval()
             logger.info("✅ Florence-2 model loaded successfully!")
+            
+            if self.compile_decoder and not self._load_compiled_engine():
+                logger.info("💡 Compiled decoder unavailable, using eager generate...")
+            self.load_seconds = time.perf_counter() - start
             return True
             
         except Exception as e:
@@ -113,14 +233,18 @@ class OCRProcessor:
             self.processor = None
             return False
     
+    def _inference_ready(self) -> bool:
+        """Check whether the processor and an inference engine are loaded."""
+        return self.processor is not None and (self.model is not None or self.onnx_engine is not None)
+    
     def _ensure_model_loaded(self) -> bool:
         """Ensure model is loaded before inference."""
-        if (self.model is None or self.processor is None) and not self.fallback_mode:
+        if not self._inference_ready() and not self.fallback_mode:
             logger.info("Model not loaded, loading now...")
             return self.load_model()
         elif self.fallback_mode and self.fallback_ocr is not None:
             return True
-        elif self.model is not None and self.processor is not None:
+        elif self._inference_ready():
             return True
         else:
             return self.load_model()
@@ -134,15 +258,38 @@ class OCRProcessor:
                 prompt = task_prompt
             
             inputs = self.processor(text=prompt, images=image, return_tensors="pt").to(self.device)
+            timer = DecodeTimer()
             
-            with torch.no_grad():
-                generated_ids = self.model.generate(
+            if self.onnx_engine is not None:
+                generated_ids = self.onnx_engine.generate(
+                    input_ids=inputs["input_ids"].numpy(),
+                    pixel_values=inputs["pixel_values"].numpy(),
+                    max_new_tokens=1024,
+                    timer=timer
+                )
+            elif (
+                self.compiled_engine is not None
+                and self.num_beams == 1
+                and self.compiled_engine.supports(inputs["input_ids"])
+            ):
+                generated_ids = self.compiled_engine.generate(
                     input_ids=inputs["input_ids"],
                     pixel_values=inputs["pixel_values"],
-                    max_new_tokens=1024,
-                    num_beams=3,
-                    do_sample=False
+                    timer=timer
                 )
+            else:
+                with torch.no_grad():
+                    generated_ids = self.model.generate(
+                        input_ids=inputs["input_ids"],
+                        pixel_values=inputs["pixel_values"],
+                        max_new_tokens=1024,
+                        num_beams=self.num_beams,
+                        do_sample=False,
+                        stopping_criteria=StoppingCriteriaList([_DecodeTimerCriteria(timer)])
+                    )
+            
+            self.decode_stats["decode_seconds"] += timer.decode_seconds
+            self.decode_stats["generated_tokens"] += timer.decode_tokens
             
             generated_text = self.processor.batch_decode(generated_ids, skip_special_tokens=False)[0]
             parsed_answer = self.processor.post_process_generation(
@@ -157,11 +304,32 @@ class OCRProcessor:
             logger.error(f"Inference failed: {str(e)}")
             return {}
     
+    def _should_skip(self, image: Image.Image) -> bool:
+        """Run the blank image pre-filter, only skipping images outside audit mode."""
+        start = time.perf_counter()
+        blank, stats = is_likely_blank(
+            image,
+            min_contrast=self.prefilter_min_contrast,
+            min_edge_density=self.prefilter_min_edge_density
+        )
+        elapsed_ms = 1000 * (time.perf_counter() - start)
+        self.prefilter_stats["checked"] += 1
+        
+        if not blank:
+            return False
+        
+        details = f"contrast={stats['contrast']:.2f}, edge_density={stats['edge_density']:.4f}, {elapsed_ms:.1f}ms"
+        if self.prefilter == "audit":
+            self.prefilter_stats["would_reject"] += 1
+            logger.info(f"Pre-filter audit: would skip {image.width}x{image.height} image ({details})")
+            return False
+        
+        self.prefilter_stats["rejected"] += 1
+        logger.info(f"Pre-filter skipped {image.width}x{image.height} image ({details})")
+        return True
+    
     def extract_text(self, image: Union[Image.Image, str]) -> str:
         """Extract text from an image using the VLM."""
-        if not self._ensure_model_loaded():
-            return "❌ Error: Could not load model"
-        
         try:
             if isinstance(image, str):
                 image = Image.open(image).convert('RGB')
@@ -171,6 +339,13 @@ class OCRProcessor:
             if image.mode != 'RGB':
                 image = image.convert('RGB')
             
+            # Runs before model loading so blank images never wait for Florence-2
+            if self.prefilter != "off" and self._should_skip(image):
+                return NO_TEXT_MESSAGE
+            
+            if not self._ensure_model_loaded():
+                return "❌ Error: Could not load model"
+            
             logger.info("Extracting text from image...")
             
             if self.fallback_mode and self.fallback_ocr is not None:
@@ -190,7 +365,7 @@ class OCRProcessor:
                         logger.info(f"✅ Successfully extracted text: {len(extracted_text)} characters")
                         return extracted_text
                     else:
-                        return "No text detected in the image"
+                        return NO_TEXT_MESSAGE
             else:
                 result = self._run_inference(image, "<OCR>")
                 
@@ -200,7 +375,7 @@ class OCRProcessor:
                         logger.info(f"✅ Successfully extracted text: {len(extracted_text)} characters")
                         return extracted_text
                     else:
-                        return "No text detected in the image"
+                        return NO_TEXT_MESSAGE
                 else:
                     return "❌ Error: Failed to process image"
                 
@@ -208,13 +383,23 @@ class OCRProcessor:
             logger.error(f"Text extraction failed: {str(e)}")
             return f"❌ Error: {str(e)}"
     
+    def per_token_latency_ms(self) -> Optional[float]:
+        """Return the steady-state mean decode latency per generated token."""
+        if not self.decode_stats["generated_tokens"]:
+            return None
+        return 1000 * self.decode_stats["decode_seconds"] / self.decode_stats["generated_tokens"]
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the loaded model."""
         info = {
             "model_name": self.model_name,
             "device": self.device,
             "torch_dtype": str(self.torch_dtype),
-            "model_loaded": self.model is not None,
+            "engine": self.engine,
+            "compiled_decoder": self.compiled_engine is not None,
+            "prefilter": self.prefilter,
+            "prefilter_stats": dict(self.prefilter_stats),
+            "model_loaded": self._inference_ready(),
             "processor_loaded": self.processor is not None,
             "fallback_mode": self.fallback_mode
         }
@@ -227,6 +412,19 @@ class OCRProcessor:
                 info["ocr_mode"] = "EasyOCR Fallback"
                 info["parameters"] = "EasyOCR"
         
+        if self.onnx_engine is not None:
+            info["onnx_threads"] = self.onnx_engine.num_threads or "default"
+        
+        if self.load_seconds is not None:
+            info["load_seconds"] = round(self.load_seconds, 2)
+        
+        if self.compiled_engine is not None:
+            info["compile_warmup_seconds"] = round(self.compiled_engine.stats["warmup_seconds"], 2)
+        
+        per_token_ms = self.per_token_latency_ms()
+        if per_token_ms is not None:
+            info["per_token_latency_ms"] = round(per_token_ms, 2)
+        
         if self.model is not None:
             try:
                 param_count = sum(p.numel() for p in self.model.parameters())
@@ -240,10 +438,18 @@ class OCRProcessor:
     def cleanup(self):
         """Clean up model resources."""
         try:
+            if self.compiled_engine is not None:
+                self.compiled_engine.cleanup()
+                self.compiled_engine = None
+            
             if self.model is not None:
                 del self.model
                 self.model = None
             
+            if self.onnx_engine is not None:
+                self.onnx_engine.cleanup()
+                self.onnx_engine = None
+            
             if self.processor is not None:
                 del self.processor
                 self.processor = None
@@ -0,0 +1,338 @@
+"""
+ONNX Runtime inference engine for Florence-2 on CPU.
+"""
+
+import os
+import json
+import math
+import inspect
+import logging
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+
+from .decoding import DecodeTimer, generation_settings, select_next_token
+
+logger = logging.getLogger(__name__)
+
+ENCODER_FILE = "encoder.onnx"
+DECODER_FILE = "decoder.onnx"
+DECODER_WITH_PAST_FILE = "decoder_with_past.onnx"
+CONFIG_FILE = "generation.json"
+ONNX_OPSET = 17
+
+
+def default_export_dir(model_name: str) -> str:
+    """Return the cache directory used for a model's exported ONNX graphs."""
+    base_dir = os.getenv("TEXTLENS_ONNX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "textlens", "onnx"))
+    return os.path.join(base_dir, model_name.replace("/", "--"))
+
+
+def default_num_threads() -> Optional[int]:
+    """Return the intra-op thread count for this process, or None for ONNX Runtime's default.
+    
+    `os.cpu_count()` reports the host's CPUs inside containers, so the CPU affinity
+    mask and any cgroup v2 quota are used instead.
+    """
+    override = os.getenv("TEXTLENS_ONNX_THREADS")
+    if override:
+        return max(int(override), 1)
+
+    threads = None
+    if hasattr(os, "sched_getaffinity"):
+        threads = len(os.sched_getaffinity(0))
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            limit = max(math.ceil(int(quota) / int(period)), 1)
+            threads = min(threads, limit) if threads else limit
+    except (OSError, ValueError):
+        pass
+
+    return threads
+
+
+def _build_wrappers():
+    """Build the torch modules that are traced for export."""
+    import torch
+
+    class EncoderWrapper(torch.nn.Module):
+        """Vision tower, image projection and text encoder in a single graph."""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, pixel_values):
+            image_features = self.model._encode_image(pixel_values)
+            inputs_embeds = self.model.get_input_embeddings()(input_ids)
+            inputs_embeds, attention_mask = self.model._merge_input_ids_with_image_features(image_features, inputs_embeds)
+            encoder = self.model.language_model.get_encoder()
+            return encoder(inputs_embeds=inputs_embeds, attention_mask=attention_mask, return_dict=True).last_hidden_state
+
+    class DecoderWrapper(torch.nn.Module):
+        """Single-token decoder step returning logits and the updated KV cache."""
+
+        def __init__(self, model, with_past: bool):
+            super().__init__()
+            self.decoder = model.language_model.get_decoder()
+            self.lm_head = model.language_model.lm_head
+            self.final_logits_bias = getattr(model.language_model, "final_logits_bias", None)
+            self.with_past = with_past
+
+        def forward(self, input_ids, encoder_hidden_states, *past):
+            past_key_values = None
+            if past:
+                past_key_values = tuple(tuple(past[i:i + 4]) for i in range(0, len(past), 4))
+            outputs = self.decoder(
+                input_ids=input_ids,
+                encoder_hidden_states=encoder_hidden_states,
+                past_key_values=past_key_values,
+                use_cache=True,
+                return_dict=True
+            )
+            logits = self.lm_head(outputs.last_hidden_state)
+            if self.final_logits_bias is not None:
+                logits = logits + self.final_logits_bias
+            if self.with_past:
+                # Cross-attention keys/values never change after the first step
+                present = [t for layer in outputs.past_key_values for t in layer[:2]]
+            else:
+                present = [t for layer in outputs.past_key_values for t in layer]
+            return (logits, *present)
+
+    return EncoderWrapper, DecoderWrapper
+
+
+def export_florence_to_onnx(model, processor, export_dir: str) -> bool:
+    """Export a loaded Florence-2 model to encoder and KV-cached decoder ONNX graphs."""
+    import torch
+    from PIL import Image
+
+    try:
+        os.makedirs(export_dir, exist_ok=True)
+        logger.info(f"Exporting Florence-2 to ONNX in {export_dir}...")
+
+        model = model.to("cpu", dtype=torch.float32).eval()
+        EncoderWrapper, DecoderWrapper = _build_wrappers()
+        export_kwargs = {"opset_version": ONNX_OPSET, "do_constant_folding": True}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False
+
+        dummy_image = Image.new("RGB", (768, 768), color="white")
+        inputs = processor(text="<OCR>", images=dummy_image, return_tensors="pt")
+        input_ids = inputs["input_ids"]
+        pixel_values = inputs["pixel_values"].to(torch.float32)
+
+        config = generation_settings(model)
+        num_layers = config["num_layers"]
+        decoder_start_token_id = config["decoder_start_token_id"]
+
+        encoder = EncoderWrapper(model).eval()
+        decoder = DecoderWrapper(model, with_past=False).eval()
+        decoder_with_past = DecoderWrapper(model, with_past=True).eval()
+
+        with torch.no_grad():
+            encoder_hidden_states = encoder(input_ids, pixel_values)
+            decoder_input_ids = torch.tensor([[decoder_start_token_id]], dtype=torch.long)
+            first_step = decoder(decoder_input_ids, encoder_hidden_states)
+
+            torch.onnx.export(
+                encoder,
+                (input_ids, pixel_values),
+                os.path.join(export_dir, ENCODER_FILE),
+                input_names=["input_ids", "pixel_values"],
+                output_names=["encoder_hidden_states"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "prompt_length"},
+                    "pixel_values": {0: "batch"},
+                    "encoder_hidden_states": {0: "batch", 1: "encoder_length"}
+                },
+                **export_kwargs
+            )
+
+            present_names = []
+            past_names = []
+            dynamic_axes = {
+                "input_ids": {0: "batch"},
+                "encoder_hidden_states": {0: "batch", 1: "encoder_length"},
+                "logits": {0: "batch"}
+            }
+            for i in range(num_layers):
+                for kind, length_axis in (("decoder", "past_length"), ("encoder", "encoder_length")):
+                    for tensor in ("key", "value"):
+                        name = f"present.{i}.{kind}.{tensor}"
+                        present_names.append(name)
+                        dynamic_axes[name] = {0: "batch", 2: length_axis}
+
+            torch.onnx.export(
+                decoder,
+                (decoder_input_ids, encoder_hidden_states),
+                os.path.join(export_dir, DECODER_FILE),
+                input_names=["input_ids", "encoder_hidden_states"],
+                output_names=["logits"] + present_names,
+                dynamic_axes=dynamic_axes,
+                **export_kwargs
+            )
+
+            past_inputs = list(first_step[1:])
+            present_self_names = []
+            dynamic_axes = {
+                "input_ids": {0: "batch"},
+                "encoder_hidden_states": {0: "batch", 1: "encoder_length"},
+                "logits": {0: "batch"}
+            }
+            for i in range(num_layers):
+                for kind, length_axis in (("decoder", "past_length"), ("encoder", "encoder_length")):
+                    for tensor in ("key", "value"):
+                        name = f"past.{i}.{kind}.{tensor}"
+                        past_names.append(name)
+                        dynamic_axes[name] = {0: "batch", 2: length_axis}
+                for tensor in ("key", "value"):
+                    name = f"present.{i}.decoder.{tensor}"
+                    present_self_names.append(name)
+                    dynamic_axes[name] = {0: "batch", 2: "total_length"}
+
+            torch.onnx.export(
+                decoder_with_past,
+                (decoder_input_ids, encoder_hidden_states, *past_inputs),
+                os.path.join(export_dir, DECODER_WITH_PAST_FILE),
+                input_names=["input_ids", "encoder_hidden_states"] + past_names,
+                output_names=["logits"] + present_self_names,
+                dynamic_axes=dynamic_axes,
+                **export_kwargs
+            )
+
+        with open(os.path.join(export_dir, CONFIG_FILE), "w") as f:
+            json.dump(config, f, indent=2)
+
+        logger.info("✅ ONNX export completed successfully!")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ ONNX export failed: {str(e)}")
+        return False
+
+
+class ONNXInferenceEngine:
+    """Greedy Florence-2 generation with ONNX Runtime and a KV cache."""
+
+    def __init__(self, export_dir: str, num_threads: Optional[int] = None):
+        self.export_dir = export_dir
+        self.num_threads = num_threads or default_num_threads()
+        self.encoder = None
+        self.decoder = None
+        self.decoder_with_past = None
+        self.config: Dict[str, Any] = {}
+
+    def is_exported(self) -> bool:
+        """Check whether all graphs and the generation config exist on disk."""
+        return all(
+            os.path.exists(os.path.join(self.export_dir, name))
+            for name in (ENCODER_FILE, DECODER_FILE, DECODER_WITH_PAST_FILE, CONFIG_FILE)
+        )
+
+    def _session_options(self):
+        """Build session options tuned for single-request CPU latency."""
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = 1
+        # Spinning workers burn CPU quota that other threads in the container need
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        return options
+
+    def load(self) -> bool:
+        """Create ONNX Runtime sessions for the exported graphs."""
+        try:
+            import onnxruntime as ort
+
+            with open(os.path.join(self.export_dir, CONFIG_FILE)) as f:
+                self.config = json.load(f)
+
+            options = self._session_options()
+            providers = ["CPUExecutionProvider"]
+            self.encoder = ort.InferenceSession(os.path.join(self.export_dir, ENCODER_FILE), options, providers=providers)
+            self.decoder = ort.InferenceSession(os.path.join(self.export_dir, DECODER_FILE), options, providers=providers)
+            self.decoder_with_past = ort.InferenceSession(
+                os.path.join(self.export_dir, DECODER_WITH_PAST_FILE), options, providers=providers
+            )
+            logger.info(f"✅ ONNX Runtime sessions loaded with {self.num_threads or 'default'} threads")
+            return True
+
+        except ImportError:
+            logger.warning("ONNX Runtime not available. Install with: pip install onnxruntime")
+        except Exception as e:
+            logger.error(f"Failed to load ONNX sessions: {str(e)}")
+
+        self.encoder = None
+        self.decoder = None
+        self.decoder_with_past = None
+        return False
+
+    @staticmethod
+    def _run(session, feed: Dict[str, np.ndarray]) -> List[np.ndarray]:
+        """Run a session, dropping feeds that the exporter pruned from the graph."""
+        input_names = {i.name for i in session.get_inputs()}
+        return session.run(None, {name: value for name, value in feed.items() if name in input_names})
+
+    def generate(
+        self,
+        input_ids: np.ndarray,
+        pixel_values: np.ndarray,
+        max_new_tokens: int = 1024,
+        timer: Optional[DecodeTimer] = None
+    ) -> np.ndarray:
+        """Generate token ids for a single image and prompt."""
+        encoder_hidden_states = self._run(self.encoder, {
+            "input_ids": input_ids.astype(np.int64),
+            "pixel_values": pixel_values.astype(np.float32)
+        })[0]
+
+        num_layers = self.config["num_layers"]
+        eos_token_id = self.config["eos_token_id"]
+        max_length = max_new_tokens + 1
+        tokens = [self.config["decoder_start_token_id"]]
+
+        outputs = self._run(self.decoder, {
+            "input_ids": np.array([[tokens[-1]]], dtype=np.int64),
+            "encoder_hidden_states": encoder_hidden_states
+        })
+        logits, present = outputs[0], outputs[1:]
+        self_cache = [present[4 * i + j] for i in range(num_layers) for j in (0, 1)]
+        cross_cache = [present[4 * i + j] for i in range(num_layers) for j in (2, 3)]
+
+        while len(tokens) < max_length:
+            next_token = select_next_token(logits[0, -1], tokens, max_length, self.config)
+            tokens.append(next_token)
+            if timer is not None:
+                timer.step()
+            if next_token == eos_token_id or len(tokens) >= max_length:
+                break
+
+            feed = {
+                "input_ids": np.array([[next_token]], dtype=np.int64),
+                "encoder_hidden_states": encoder_hidden_states
+            }
+            for i in range(num_layers):
+                feed[f"past.{i}.decoder.key"] = self_cache[2 * i]
+                feed[f"past.{i}.decoder.value"] = self_cache[2 * i + 1]
+                feed[f"past.{i}.encoder.key"] = cross_cache[2 * i]
+                feed[f"past.{i}.encoder.value"] = cross_cache[2 * i + 1]
+
+            outputs = self._run(self.decoder_with_past, feed)
+            logits, self_cache = outputs[0], outputs[1:]
+
+        return np.array([tokens], dtype=np.int64)
+
+    def cleanup(self):
+        """Release ONNX Runtime sessions."""
+        self.encoder = None
+        self.decoder = None
+        self.decoder_with_past = None
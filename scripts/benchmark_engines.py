@@ -0,0 +1,202 @@
+"""
+Benchmark and output-parity check for the TextLens inference engines.
+
+Each engine runs in a fresh process so that peak memory is measured in
+isolation. Usage:
+
+    python scripts/benchmark_engines.py --images page1.png page2.png --runs 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+import resource
+import statistics
+import multiprocessing as mp
+from queue import Empty
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How often the parent checks on a benchmark child while waiting for its result
+POLL_SECONDS = 5
+
+# Benchmark names mapped to OCRProcessor engine options
+ENGINE_OPTIONS = {
+    "torch": {"engine": "torch"},
+    "torch-compiled": {"engine": "torch", "compile_decoder": True},
+    "onnx": {"engine": "onnx"}
+}
+
+
+def _peak_rss_mb() -> float:
+    """Return the peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _sample_image() -> Image.Image:
+    """Render a simple text image for runs without user-supplied images."""
+    image = Image.new("RGB", (800, 200), color="white")
+    draw = ImageDraw.Draw(image)
+    draw.text((20, 40), "TextLens benchmark sample", fill="black")
+    draw.text((20, 100), "The quick brown fox jumps over the lazy dog 0123456789", fill="black")
+    return image
+
+
+def _load_images(paths: List[str]) -> List[Image.Image]:
+    """Load benchmark images, defaulting to a rendered sample."""
+    if not paths:
+        return [_sample_image()]
+    return [Image.open(path).convert("RGB") for path in paths]
+
+
+def _run_engine(engine: str, args: Dict[str, Any], queue) -> None:
+    """Run one engine benchmark, reporting any failure to the parent as an error row."""
+    try:
+        queue.put(_benchmark_engine(engine, args))
+    except Exception as e:
+        queue.put({"engine": engine, "error": f"{type(e).__name__}: {str(e)}"})
+
+
+def _benchmark_engine(engine: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Load one engine and time text extraction."""
+    from models.ocr_processor import OCRProcessor
+
+    images = _load_images(args["images"])
+    options = ENGINE_OPTIONS[engine]
+    processor = OCRProcessor(model_name=args["model_name"], num_beams=args["num_beams"], **options)
+
+    start = time.perf_counter()
+    loaded = processor.load_model()
+    load_seconds = time.perf_counter() - start
+    if (
+        not loaded
+        or processor.fallback_mode
+        or processor.engine != options["engine"]
+        or (options.get("compile_decoder") and processor.compiled_engine is None)
+    ):
+        return {"engine": engine, "error": f"{engine} engine could not be loaded"}
+
+    outputs = [processor.extract_text(image) for image in images]
+
+    # Only the timed passes count towards decode statistics
+    processor.decode_stats = {"decode_seconds": 0.0, "generated_tokens": 0}
+    latencies = []
+    for _ in range(args["runs"]):
+        for image in images:
+            start = time.perf_counter()
+            processor.extract_text(image)
+            latencies.append(time.perf_counter() - start)
+
+    warmup_seconds = processor.compiled_engine.stats["warmup_seconds"] if processor.compiled_engine else 0.0
+    if processor.onnx_engine is not None:
+        threads = processor.onnx_engine.num_threads or "default"
+    else:
+        import torch
+        threads = torch.get_num_threads()
+    return {
+        "engine": engine,
+        "threads": threads,
+        "load_seconds": load_seconds,
+        "warmup_seconds": warmup_seconds,
+        "mean_latency": statistics.mean(latencies),
+        "p50_latency": statistics.median(latencies),
+        "max_latency": max(latencies),
+        "decode_tokens": processor.decode_stats["generated_tokens"],
+        "per_token_ms": processor.per_token_latency_ms(),
+        "peak_rss_mb": _peak_rss_mb(),
+        "outputs": outputs
+    }
+
+
+def benchmark(engine: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a single engine benchmark in an isolated process."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_engine, args=(engine, args, queue))
+    process.start()
+
+    # A crashed or OOM-killed child never reports back, so keep checking that it is alive
+    while True:
+        try:
+            result = queue.get(timeout=POLL_SECONDS)
+            break
+        except Empty:
+            if not process.is_alive():
+                try:
+                    result = queue.get(timeout=1)
+                except Empty:
+                    result = {"engine": engine, "error": f"benchmark process exited with code {process.exitcode}"}
+                break
+
+    process.join()
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare torch and ONNX Runtime inference engines.")
+    parser.add_argument("--model-name", default="microsoft/Florence-2-base")
+    parser.add_argument("--images", nargs="*", default=[], help="Image files to benchmark on")
+    parser.add_argument("--runs", type=int, default=3, help="Timed passes over the image set")
+    parser.add_argument("--engines", nargs="+", default=["torch", "onnx"], choices=sorted(ENGINE_OPTIONS))
+    args = parser.parse_args()
+
+    # The ONNX and compiled engines decode greedily, so the torch reference must as well
+    config = {
+        "model_name": args.model_name,
+        "images": args.images,
+        "runs": args.runs,
+        "num_beams": 1
+    }
+
+    results = [benchmark(engine, config) for engine in args.engines]
+
+    # Startup covers model loading plus compilation; warm-up is the compile share of it.
+    # ms/token is decode-only: it excludes preprocessing, the encoder and the first decoder step.
+    print(
+        f"\n{'engine':<15} {'threads':>8} {'load (s)':>10} {'warmup (s)':>11} {'mean (s)':>10} {'p50 (s)':>10} {'max (s)':>10} "
+        f"{'tokens':>8} {'ms/token':>10} {'peak RSS (MB)':>14}"
+    )
+    for result in results:
+        if "error" in result:
+            print(f"{result['engine']:<15} {result['error']}")
+            continue
+        per_token = f"{result['per_token_ms']:.2f}" if result["per_token_ms"] is not None else "n/a"
+        print(
+            f"{result['engine']:<15} {str(result['threads']):>8} {result['load_seconds']:>10.2f} {result['warmup_seconds']:>11.2f} "
+            f"{result['mean_latency']:>10.3f} {result['p50_latency']:>10.3f} {result['max_latency']:>10.3f} "
+            f"{result['decode_tokens']:>8} {per_token:>10} {result['peak_rss_mb']:>14.1f}"
+        )
+
+    completed = [result for result in results if "error" not in result]
+    if len(completed) != len(results):
+        return 1
+
+    reference = completed[0]
+    mismatches = 0
+    for result in completed[1:]:
+        for index, (expected, actual) in enumerate(zip(reference["outputs"], result["outputs"])):
+            if expected != actual:
+                mismatches += 1
+                print(f"\n❌ Parity mismatch on image {index} ({reference['engine']} vs {result['engine']}):")
+                print(f"  {reference['engine']}: {expected!r}")
+                print(f"  {result['engine']}: {actual!r}")
+
+    if mismatches:
+        return 1
+
+    print("\n✅ Engine outputs match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Tests for the static-cache compiled decoder in models.compiled_engine.
+
+The decoder step re-implements the BART decoder layer by hand, so these tests
+check it token for token against HF `generate` on a tiny random model.
+"""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from models.compiled_engine import CompiledTorchEngine
+from models.decoding import DecodeTimer
+from tests.tiny_florence import (
+    EOS_TOKEN_ID,
+    IMAGE_SIZE,
+    build_tiny_florence,
+    reference_generate,
+    sample_inputs
+)
+
+MAX_NEW_TOKENS = 20
+
+
+def _eager_engine(model, max_new_tokens=MAX_NEW_TOKENS, prompt_buckets=(8, 16)):
+    """Build an engine that runs the static-cache step without torch.compile."""
+    engine = CompiledTorchEngine(model, max_new_tokens=max_new_tokens, prompt_buckets=prompt_buckets)
+    with torch.no_grad():
+        pixel_values = torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+        engine.image_tokens = model._encode_image(pixel_values).shape[1]
+    engine.compiled_step = engine.decoder_step
+    return engine
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_static_cache_step_matches_generate(seed):
+    model = build_tiny_florence(seed=seed)
+    engine = _eager_engine(model)
+    input_ids, pixel_values = sample_inputs(seed)
+
+    expected = reference_generate(model, input_ids, pixel_values, MAX_NEW_TOKENS)
+    assert engine.generate(input_ids, pixel_values)[0].tolist() == expected
+
+
+def test_padding_to_larger_bucket_does_not_change_output():
+    model = build_tiny_florence(seed=1)
+    input_ids, pixel_values = sample_inputs(1, prompt_length=5)
+    expected = reference_generate(model, input_ids, pixel_values, MAX_NEW_TOKENS)
+
+    # Prompt length 5 is padded by 3 tokens into bucket 8 and by 27 into bucket 32
+    for buckets in ((8,), (32,)):
+        engine = _eager_engine(model, prompt_buckets=buckets)
+        assert engine.generate(input_ids, pixel_values)[0].tolist() == expected
+
+
+def test_prompt_longer_than_every_bucket_is_not_supported():
+    engine = _eager_engine(build_tiny_florence(), prompt_buckets=(8, 16))
+    assert engine.supports(torch.zeros(1, 16, dtype=torch.long))
+    assert not engine.supports(torch.zeros(1, 17, dtype=torch.long))
+
+
+def test_forced_eos_at_max_length():
+    model = build_tiny_florence(seed=2)
+    # Make EOS unreachable so generation only ends by forcing it at max_length
+    with torch.no_grad():
+        model.language_model.final_logits_bias[0, EOS_TOKEN_ID] = -1e4
+    engine = _eager_engine(model, max_new_tokens=6)
+    input_ids, pixel_values = sample_inputs(2)
+
+    expected = reference_generate(model, input_ids, pixel_values, max_new_tokens=6)
+    tokens = engine.generate(input_ids, pixel_values)[0].tolist()
+    assert tokens == expected
+    assert len(tokens) == 7
+    assert tokens[-1] == EOS_TOKEN_ID
+
+
+def test_decode_timer_counts_generated_tokens():
+    model = build_tiny_florence(seed=3)
+    engine = _eager_engine(model)
+    input_ids, pixel_values = sample_inputs(3)
+    timer = DecodeTimer()
+
+    tokens = engine.generate(input_ids, pixel_values, timer=timer)[0].tolist()
+    # Every token after the decoder start is generated; the first one is not timed
+    assert timer.decode_tokens == len(tokens) - 2
+
+
+def test_compiled_step_matches_generate():
+    model = build_tiny_florence(seed=4)
+    engine = CompiledTorchEngine(model, max_new_tokens=MAX_NEW_TOKENS, prompt_buckets=(8, 16))
+    assert engine.load(image_size=(IMAGE_SIZE, IMAGE_SIZE))
+    assert engine.stats["warmup_seconds"] > 0
+
+    for seed, prompt_length in ((4, 5), (5, 12)):
+        input_ids, pixel_values = sample_inputs(seed, prompt_length=prompt_length)
+        expected = reference_generate(model, input_ids, pixel_values, MAX_NEW_TOKENS)
+        assert engine.generate(input_ids, pixel_values)[0].tolist() == expected
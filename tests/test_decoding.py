@@ -0,0 +1,93 @@
+"""
+Tests for the greedy decoding helpers in models.decoding.
+"""
+
+import numpy as np
+import pytest
+
+from models.decoding import DecodeTimer, banned_ngram_tokens, select_next_token
+
+SETTINGS = {
+    "decoder_start_token_id": 2,
+    "eos_token_id": 2,
+    "forced_bos_token_id": 0,
+    "forced_eos_token_id": 2,
+    "no_repeat_ngram_size": 3
+}
+
+
+def test_banned_ngram_tokens_disabled():
+    assert banned_ngram_tokens([5, 6, 7, 5, 6], 0) == []
+
+
+def test_banned_ngram_tokens_sequence_too_short():
+    assert banned_ngram_tokens([5], 3) == []
+
+
+def test_banned_ngram_tokens_blocks_repeated_trigram():
+    assert banned_ngram_tokens([5, 6, 7, 5, 6], 3) == [7]
+
+
+def test_banned_ngram_tokens_collects_every_continuation():
+    assert sorted(banned_ngram_tokens([5, 6, 7, 5, 6, 8, 5, 6], 3)) == [7, 8]
+
+
+def test_banned_ngram_tokens_unigram_bans_all_seen_tokens():
+    assert sorted(set(banned_ngram_tokens([4, 9, 4], 1))) == [4, 9]
+
+
+def test_banned_ngram_tokens_matches_transformers():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from transformers.generation.logits_process import NoRepeatNGramLogitsProcessor
+
+    rng = np.random.default_rng(0)
+    for ngram_size in (2, 3, 4):
+        processor = NoRepeatNGramLogitsProcessor(ngram_size)
+        for _ in range(20):
+            tokens = rng.integers(0, 6, size=12).tolist()
+            scores = processor(torch.tensor([tokens]), torch.zeros(1, 6))
+            expected = sorted(torch.nonzero(torch.isinf(scores[0])).flatten().tolist())
+            assert sorted(set(banned_ngram_tokens(tokens, ngram_size))) == expected
+
+
+def test_select_next_token_forces_bos_after_start_token():
+    logits = np.array([0.0, 0.0, 0.0, 5.0])
+    assert select_next_token(logits, [2], max_length=10, settings=SETTINGS) == 0
+
+
+def test_select_next_token_forces_eos_at_max_length():
+    logits = np.array([0.0, 0.0, 0.0, 5.0])
+    assert select_next_token(logits, [2, 0, 3, 4], max_length=5, settings=SETTINGS) == 2
+
+
+def test_select_next_token_takes_argmax():
+    logits = np.array([0.0, 1.0, 0.5, 3.0, 2.0])
+    assert select_next_token(logits, [2, 0], max_length=10, settings=SETTINGS) == 3
+
+
+def test_select_next_token_skips_banned_ngram():
+    logits = np.array([0.0, 1.0, 0.5, 3.0, 2.0])
+    # Generating 3 would repeat the trigram (2, 0, 3)
+    tokens = [2, 0, 3, 1, 2, 0]
+    assert select_next_token(logits, tokens, max_length=20, settings=SETTINGS) == 4
+    # The caller's logits are left untouched
+    assert logits[1] == 1.0
+
+
+def test_select_next_token_without_forced_tokens():
+    settings = dict(SETTINGS, forced_bos_token_id=None, forced_eos_token_id=None)
+    logits = np.array([0.0, 1.0, 0.5, 3.0])
+    assert select_next_token(logits, [2], max_length=2, settings=settings) == 3
+
+
+def test_decode_timer_excludes_first_step():
+    timer = DecodeTimer()
+    assert timer.decode_tokens == 0
+    assert timer.decode_seconds == 0.0
+
+    for _ in range(4):
+        timer.step()
+
+    assert timer.decode_tokens == 3
+    assert timer.decode_seconds >= 0.0
@@ -0,0 +1,68 @@
+"""
+Tests for the blank image pre-filter in utils.image_utils.
+"""
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from utils.image_utils import is_likely_blank, text_presence_stats
+
+
+def _page_with_line(size, text, line_height):
+    """Render a single line of black text on a white page."""
+    line = Image.new("L", (len(text) * 6 + 4, 15), color=255)
+    ImageDraw.Draw(line).text((2, 2), text, fill=0)
+    scale = line_height / line.height
+    line = line.resize((int(line.width * scale), line_height), Image.Resampling.NEAREST)
+
+    page = Image.new("RGB", size, color="white")
+    page.paste(line.convert("RGB"), (size[0] // 10, size[1] // 2))
+    return page
+
+
+def _noisy_blank_scan(size, seed=0):
+    """Near-uniform paper texture with sensor noise and no text."""
+    rng = np.random.default_rng(seed)
+    pixels = np.clip(235 + rng.normal(0, 6, (size[1], size[0])), 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels).convert("RGB")
+
+
+def test_blank_image_is_rejected():
+    blank, _ = is_likely_blank(Image.new("RGB", (1240, 1754), color="white"))
+    assert blank
+
+
+def test_uniform_gray_image_is_rejected():
+    blank, _ = is_likely_blank(Image.new("RGB", (800, 600), color=(128, 128, 128)))
+    assert blank
+
+
+def test_noisy_blank_scan_is_rejected():
+    blank, _ = is_likely_blank(_noisy_blank_scan((1240, 1754)))
+    assert blank
+
+
+def test_single_line_screenshot_is_kept():
+    blank, stats = is_likely_blank(_page_with_line((1920, 1080), "Error: connection refused", 24))
+    assert not blank, stats
+
+
+def test_single_line_a4_page_is_kept():
+    blank, stats = is_likely_blank(_page_with_line((2480, 3508), "Invoice #12345 Total: $99.00", 40))
+    assert not blank, stats
+
+
+def test_textured_photo_without_text_is_kept():
+    # Out of scope for the pre-filter: only blank and near-uniform images are rejected
+    rng = np.random.default_rng(1)
+    gradient = np.linspace(40, 200, 1024)[None, :] + rng.normal(0, 20, (768, 1024))
+    photo = Image.fromarray(np.clip(gradient, 0, 255).astype(np.uint8)).convert("RGB")
+    blank, stats = is_likely_blank(photo)
+    assert not blank, stats
+
+
+def test_text_presence_stats_keys():
+    stats = text_presence_stats(Image.new("RGB", (64, 64), color="white"))
+    assert set(stats) == {"contrast", "edge_density"}
+    assert stats["contrast"] == 0.0
+    assert stats["edge_density"] == 0.0
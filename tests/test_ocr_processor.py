@@ -0,0 +1,100 @@
+"""
+Tests for the blank image pre-filter in OCRProcessor.extract_text.
+
+Model loading and inference are monkeypatched, so these tests only check
+whether an image reaches Florence-2 and how skips are counted and logged.
+"""
+
+import logging
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from PIL import Image, ImageDraw
+
+from models.ocr_processor import NO_TEXT_MESSAGE, OCRProcessor
+
+
+def _blank_page():
+    return Image.new("RGB", (1240, 1754), color="white")
+
+
+def _text_page():
+    image = Image.new("RGB", (800, 200), color="white")
+    ImageDraw.Draw(image).text((20, 80), "Invoice #12345 Total: $99.00", fill="black")
+    return image
+
+
+@pytest.fixture
+def make_processor(monkeypatch):
+    """Build an OCRProcessor whose model loading and inference are stubbed out."""
+    def build(**kwargs):
+        processor = OCRProcessor(model_name="microsoft/Florence-2-base", **kwargs)
+        processor.load_calls = 0
+
+        def fake_load_model():
+            processor.load_calls += 1
+            processor.processor = object()
+            processor.model = object()
+            return True
+
+        monkeypatch.setattr(processor, "load_model", fake_load_model)
+        monkeypatch.setattr(processor, "_run_inference", lambda image, task: {"<OCR>": "extracted"})
+        return processor
+
+    return build
+
+
+def test_prefilter_on_skips_blank_image_without_loading_model(make_processor):
+    processor = make_processor(prefilter="on")
+
+    assert processor.extract_text(_blank_page()) == NO_TEXT_MESSAGE
+    assert processor.load_calls == 0
+    assert processor.prefilter_stats == {"checked": 1, "rejected": 1, "would_reject": 0}
+
+
+def test_prefilter_on_keeps_text_image(make_processor):
+    processor = make_processor(prefilter="on")
+
+    assert processor.extract_text(_text_page()) == "extracted"
+    assert processor.load_calls == 1
+    assert processor.prefilter_stats == {"checked": 1, "rejected": 0, "would_reject": 0}
+
+
+def test_prefilter_audit_logs_but_does_not_skip(make_processor, caplog):
+    processor = make_processor(prefilter="audit")
+
+    with caplog.at_level(logging.INFO, logger="models.ocr_processor"):
+        assert processor.extract_text(_blank_page()) == "extracted"
+
+    assert processor.load_calls == 1
+    assert processor.prefilter_stats == {"checked": 1, "rejected": 0, "would_reject": 1}
+    assert "Pre-filter audit: would skip 1240x1754 image" in caplog.text
+
+
+def test_prefilter_off_does_not_check(make_processor):
+    processor = make_processor(prefilter="off")
+
+    assert processor.extract_text(_blank_page()) == "extracted"
+    assert processor.prefilter_stats["checked"] == 0
+
+
+def test_prefilter_thresholds_are_passed_through(make_processor):
+    # A zero contrast threshold can never be undercut, so nothing is skipped
+    processor = make_processor(prefilter="on", prefilter_min_contrast=0.0)
+
+    assert processor.extract_text(_blank_page()) == "extracted"
+    assert processor.prefilter_stats["rejected"] == 0
+
+
+@pytest.mark.parametrize("mode", ["", "ON", "skip", None])
+def test_invalid_prefilter_mode_raises(mode):
+    with pytest.raises(ValueError, match="Unsupported prefilter mode"):
+        OCRProcessor(prefilter=mode)
+
+
+def test_invalid_engine_raises():
+    with pytest.raises(ValueError, match="Unsupported engine"):
+        OCRProcessor(engine="tensorrt")
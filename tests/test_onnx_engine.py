@@ -0,0 +1,81 @@
+"""
+Tests for the ONNX Runtime inference engine.
+"""
+
+import os
+
+import pytest
+
+from models.onnx_engine import default_num_threads
+
+
+def test_default_num_threads_override(monkeypatch):
+    monkeypatch.setenv("TEXTLENS_ONNX_THREADS", "3")
+    assert default_num_threads() == 3
+
+
+def test_default_num_threads_respects_affinity(monkeypatch):
+    monkeypatch.delenv("TEXTLENS_ONNX_THREADS", raising=False)
+    threads = default_num_threads()
+    if hasattr(os, "sched_getaffinity"):
+        assert 1 <= threads <= len(os.sched_getaffinity(0))
+
+
+@pytest.fixture(scope="module")
+def exported_tiny_engine(tmp_path_factory):
+    """Export the tiny Florence stand-in once and load it with ONNX Runtime."""
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from models.onnx_engine import ONNXInferenceEngine, export_florence_to_onnx
+    from tests.tiny_florence import TinyProcessor, build_tiny_florence
+
+    model = build_tiny_florence()
+    export_dir = str(tmp_path_factory.mktemp("onnx_tiny"))
+    assert export_florence_to_onnx(model, TinyProcessor(), export_dir)
+
+    engine = ONNXInferenceEngine(export_dir, num_threads=1)
+    assert engine.is_exported()
+    assert engine.load()
+    return model, engine
+
+
+@pytest.mark.parametrize("seed,prompt_length", [(0, 5), (1, 5), (2, 5), (3, 9), (4, 2)])
+def test_onnx_generate_matches_torch_generate(exported_tiny_engine, seed, prompt_length):
+    from tests.tiny_florence import reference_generate, sample_inputs
+
+    model, engine = exported_tiny_engine
+    # Prompt lengths other than the traced one exercise the dynamic encoder axes
+    input_ids, pixel_values = sample_inputs(seed, prompt_length=prompt_length)
+
+    expected = reference_generate(model, input_ids, pixel_values, max_new_tokens=20)
+    actual = engine.generate(input_ids.numpy(), pixel_values.numpy(), max_new_tokens=20)[0].tolist()
+    assert actual == expected
+
+
+def test_florence_onnx_output_matches_torch_greedy(tmp_path):
+    """End-to-end parity on the real model; skipped unless it is cached locally."""
+    pytest.importorskip("torch")
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from huggingface_hub import try_to_load_from_cache
+
+    model_name = os.getenv("TEXTLENS_TEST_MODEL", "microsoft/Florence-2-base")
+    if not isinstance(try_to_load_from_cache(model_name, "config.json"), str):
+        pytest.skip(f"{model_name} is not available locally")
+
+    from PIL import Image, ImageDraw
+    from models.ocr_processor import OCRProcessor
+
+    image = Image.new("RGB", (800, 200), color="white")
+    ImageDraw.Draw(image).text((20, 80), "TextLens parity check 0123456789", fill="black")
+
+    torch_processor = OCRProcessor(model_name=model_name, engine="torch", num_beams=1)
+    onnx_processor = OCRProcessor(
+        model_name=model_name, engine="onnx", num_beams=1, onnx_export_dir=str(tmp_path)
+    )
+    assert torch_processor.load_model() and not torch_processor.fallback_mode
+    assert onnx_processor.load_model() and onnx_processor.onnx_engine is not None
+
+    assert onnx_processor.extract_text(image) == torch_processor.extract_text(image)
@@ -0,0 +1,117 @@
+"""
+Tiny Florence-2 stand-in for inference engine tests.
+
+It mimics the parts of Florence-2 that the custom inference engines rely on:
+a BART language model plus `_encode_image` and
+`_merge_input_ids_with_image_features`. It is randomly initialised, so the
+engines can be checked against HF `generate` without downloading weights.
+Import it only after `pytest.importorskip("torch")` and `("transformers")`.
+"""
+
+import torch
+from transformers import BartConfig, BartForConditionalGeneration
+from transformers.modeling_outputs import BaseModelOutput
+
+PATCH_SIZE = 4
+IMAGE_SIZE = 16
+VOCAB_SIZE = 64
+BOS_TOKEN_ID = 0
+PAD_TOKEN_ID = 1
+EOS_TOKEN_ID = 2
+
+
+class TinyFlorence(torch.nn.Module):
+    """Florence-2 shaped wrapper around a small BART language model."""
+
+    def __init__(self, language_model):
+        super().__init__()
+        self.language_model = language_model
+        d_model = language_model.config.d_model
+        self.image_projection = torch.nn.Linear(3 * PATCH_SIZE * PATCH_SIZE, d_model)
+
+    def get_input_embeddings(self):
+        return self.language_model.get_input_embeddings()
+
+    def _encode_image(self, pixel_values):
+        batch, channels, height, width = pixel_values.shape
+        patches = pixel_values.reshape(
+            batch, channels, height // PATCH_SIZE, PATCH_SIZE, width // PATCH_SIZE, PATCH_SIZE
+        )
+        patches = patches.permute(0, 2, 4, 1, 3, 5).reshape(batch, -1, channels * PATCH_SIZE * PATCH_SIZE)
+        return self.image_projection(patches)
+
+    def _merge_input_ids_with_image_features(self, image_features, inputs_embeds):
+        inputs_embeds = torch.cat([image_features, inputs_embeds], dim=1)
+        attention_mask = torch.ones(inputs_embeds.shape[:2], dtype=torch.long, device=inputs_embeds.device)
+        return inputs_embeds, attention_mask
+
+
+class TinyProcessor:
+    """Stand-in for the Florence-2 processor used during ONNX export."""
+
+    def __call__(self, text=None, images=None, return_tensors="pt"):
+        return {
+            "input_ids": torch.tensor([[BOS_TOKEN_ID, 5, 6, 7, EOS_TOKEN_ID]]),
+            "pixel_values": torch.rand(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+        }
+
+
+def build_tiny_florence(seed: int = 0, no_repeat_ngram_size: int = 3) -> TinyFlorence:
+    """Build a randomly initialised TinyFlorence in eval mode."""
+    torch.manual_seed(seed)
+    config = BartConfig(
+        vocab_size=VOCAB_SIZE,
+        d_model=32,
+        encoder_layers=2,
+        decoder_layers=2,
+        encoder_attention_heads=4,
+        decoder_attention_heads=4,
+        encoder_ffn_dim=64,
+        decoder_ffn_dim=64,
+        max_position_embeddings=128,
+        init_std=0.2,
+        scale_embedding=True,
+        bos_token_id=BOS_TOKEN_ID,
+        pad_token_id=PAD_TOKEN_ID,
+        eos_token_id=EOS_TOKEN_ID,
+        decoder_start_token_id=EOS_TOKEN_ID,
+        forced_bos_token_id=BOS_TOKEN_ID,
+        forced_eos_token_id=EOS_TOKEN_ID
+    )
+    language_model = BartForConditionalGeneration(config)
+    generation_config = language_model.generation_config
+    generation_config.decoder_start_token_id = EOS_TOKEN_ID
+    generation_config.eos_token_id = EOS_TOKEN_ID
+    generation_config.forced_bos_token_id = BOS_TOKEN_ID
+    generation_config.forced_eos_token_id = EOS_TOKEN_ID
+    generation_config.no_repeat_ngram_size = no_repeat_ngram_size
+
+    # Random final_logits_bias so the engines must apply it to match generate
+    language_model.final_logits_bias.normal_(0, 0.1)
+    return TinyFlorence(language_model).eval()
+
+
+def sample_inputs(seed: int, prompt_length: int = 5):
+    """Random prompt ids and pixel values for a TinyFlorence forward pass."""
+    generator = torch.Generator().manual_seed(seed)
+    input_ids = torch.randint(3, VOCAB_SIZE, (1, prompt_length), generator=generator)
+    pixel_values = torch.rand(1, 3, IMAGE_SIZE, IMAGE_SIZE, generator=generator)
+    return input_ids, pixel_values
+
+
+def reference_generate(model: TinyFlorence, input_ids, pixel_values, max_new_tokens: int) -> list:
+    """Greedy HF `generate` on the merged image and prompt embeddings."""
+    with torch.no_grad():
+        image_features = model._encode_image(pixel_values)
+        inputs_embeds = model.get_input_embeddings()(input_ids)
+        inputs_embeds, attention_mask = model._merge_input_ids_with_image_features(image_features, inputs_embeds)
+        encoder = model.language_model.get_encoder()
+        encoder_outputs = encoder(inputs_embeds=inputs_embeds, attention_mask=attention_mask, return_dict=True)
+        generated = model.language_model.generate(
+            encoder_outputs=BaseModelOutput(last_hidden_state=encoder_outputs.last_hidden_state),
+            attention_mask=attention_mask,
+            max_new_tokens=max_new_tokens,
+            num_beams=1,
+            do_sample=False
+        )
+    return generated[0].tolist()
@@ -2,6 +2,7 @@
 Event handlers for TextLens OCR interface.
 """
 
+import os
 import logging
 from PIL import Image
 from models.ocr_processor import OCRProcessor
@@ -16,7 +17,11 @@ def initialize_ocr_processor():
     global ocr_processor
     try:
         logger.info("Initializing OCR processor...")
-        ocr_processor = OCRProcessor(model_name="microsoft/Florence-2-base")
+        ocr_processor = OCRProcessor(
+            model_name="microsoft/Florence-2-base",
+            engine=os.getenv("TEXTLENS_ENGINE", "torch"),
+            prefilter=os.getenv("TEXTLENS_PREFILTER", "off")
+        )
         return True
     except Exception as e:
         logger.error(f"Failed to initialize OCR processor: {str(e)}")
@@ -3,15 +3,23 @@ Image utilities for TextLens OCR application.
 """
 
 from PIL import Image, ImageEnhance, ImageFilter
-from typing import Tuple, Optional, Union
+from typing import Tuple, Optional, Union, Dict
 import io
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 # Supported image formats
 SUPPORTED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'BMP', 'TIFF', 'GIF'}
 
+# Text pre-filter defaults
+PREFILTER_SIZE = (256, 256)
+PREFILTER_TILES = 16
+PREFILTER_EDGE_LEVEL = 32
+DEFAULT_MIN_CONTRAST = 6.0
+DEFAULT_MIN_EDGE_DENSITY = 0.001
+
 def validate_image(image: Union[Image.Image, str, bytes]) -> bool:
     """Validate if the input is a valid image."""
     try:
@@ -86,4 +94,44 @@ def convert_format(
     # TODO: Implement format conversion
     buffer = io.BytesIO()
     image.save(buffer, format=target_format)
-    return buffer.getvalue() 
\ No newline at end of file
+    return buffer.getvalue() 
+
+def text_presence_stats(image: Image.Image) -> Dict[str, float]:
+    """Compute cheap contrast and edge statistics on a downsampled grayscale copy."""
+    gray = image.convert('L')
+    gray.thumbnail(PREFILTER_SIZE, Image.Resampling.BILINEAR)
+    
+    pixels = np.asarray(gray, dtype=np.float32)
+    # Use the busiest tile's std so a single line of text on a large page still counts
+    height, width = pixels.shape
+    tile_h = max(height // PREFILTER_TILES, 1)
+    tile_w = max(width // PREFILTER_TILES, 1)
+    tiles = pixels[:height // tile_h * tile_h, :width // tile_w * tile_w]
+    tiles = tiles.reshape(height // tile_h, tile_h, width // tile_w, tile_w)
+    
+    # Drop the one-pixel border where FIND_EDGES produces artifacts
+    edges = np.asarray(gray.filter(ImageFilter.FIND_EDGES))[1:-1, 1:-1]
+    
+    return {
+        "contrast": float(tiles.std(axis=(1, 3)).max()),
+        "edge_density": float((edges > PREFILTER_EDGE_LEVEL).mean()) if edges.size else 0.0
+    }
+
+def is_likely_blank(
+    image: Image.Image,
+    min_contrast: float = DEFAULT_MIN_CONTRAST,
+    min_edge_density: float = DEFAULT_MIN_EDGE_DENSITY
+) -> Tuple[bool, Dict[str, float]]:
+    """Check whether an image is blank or near-uniform enough to skip OCR.
+    
+    Both signals must be weak, so an image is kept if either one suggests text.
+    This does not detect text: textured images without text, such as photos,
+    are kept and still go through OCR.
+    """
+    try:
+        stats = text_presence_stats(image)
+        blank = stats["contrast"] < min_contrast and stats["edge_density"] < min_edge_density
+        return blank, stats
+    except Exception as e:
+        logger.error(f"Error checking image for blankness: {str(e)}")
+        return False, {}